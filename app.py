@@ -1,15 +1,116 @@
+import functools
+import json
+import os
+import threading
+
+import numba
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from dash import Dash, dcc, html, Input, Output
+import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+import pyarrow.feather as feather
+from dash import Dash, dcc, html, Input, Output, State
+from flask_caching import Cache
+from numba import njit, prange
 
 # ===========================
 # Data and configuration
 # ===========================
 DATA_PATH = "airbnb_cleaned.csv"
+DATA_CACHE_PATH = DATA_PATH + ".feather"
+PRECOMPUTED_PATH = "airbnb_precomputed.feather"
 PRICE_AXIS_MAX = 600  # y-axis max for price charts
+HIST_BINS = 50  # price histogram bins between 0 and the price cap
+MAP_MAX_POINTS = 10_000  # listings drawn on the map per filter state
+
+DATA_DTYPES = {
+    "price": "float32",
+    "latitude": "float32",
+    "longitude": "float32",
+    "minimum_nights": "int16",
+    "number_of_reviews": "int32",
+}
+
+
+def _read_cache(path, cache_key):
+    # A Feather cache is only used if it is newer than the CSV and was written
+    # with the same key; a missing, stale or unreadable file is a cache miss.
+    if not (
+        os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(DATA_PATH)
+    ):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+    if (table.schema.metadata or {}).get(b"cache_key") != cache_key.encode():
+        return None
+    return table.to_pandas()
+
+
+def _write_cache(frame, path, cache_key):
+    # Write to a temp file and rename it into place, so a crash or a
+    # concurrent worker never leaves a truncated cache behind
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), b"cache_key": cache_key.encode()}
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-df = pd.read_csv(DATA_PATH)
-df = df[df["price"] > 0].copy()
+
+# Parse the CSV once and keep a Feather copy next to it; the CSV stays the
+# source of truth and the cache is rebuilt whenever it is newer or was parsed
+# with different dtypes.
+_DATA_CACHE_KEY = json.dumps(DATA_DTYPES, sort_keys=True)
+df = _read_cache(DATA_CACHE_PATH, _DATA_CACHE_KEY)
+if df is None:
+    df = pd.read_csv(DATA_PATH, engine="pyarrow", dtype=DATA_DTYPES)
+    _write_cache(df, DATA_CACHE_PATH, _DATA_CACHE_KEY)
+
+df = df[df["price"] > 0].dropna(subset=["latitude", "longitude"]).copy()
+df["neighbourhood_group"] = df["neighbourhood_group"].astype("category")
+df["room_type"] = df["room_type"].astype("category")
+
+# Contiguous column arrays for the filter hot path, so callbacks never go
+# through DataFrame indexing to build masks or KPIs
+_PRICE_ARR = df["price"].to_numpy()
+_NIGHTS_ARR = df["minimum_nights"].to_numpy()
+_NG_CODES = df["neighbourhood_group"].cat.codes.to_numpy()
+_NG_CATS = df["neighbourhood_group"].cat.categories.to_numpy()
+_RT_CODES = df["room_type"].cat.codes.to_numpy()
+_RT_CATS = df["room_type"].cat.categories.to_numpy()
+# Dropdown value -> category code; "All" is the kernel's -1 wildcard
+_NG_TO_IDX = {"All": -1, **{cat: i for i, cat in enumerate(_NG_CATS)}}
+_RT_TO_IDX = {"All": -1, **{cat: i for i, cat in enumerate(_RT_CATS)}}
+
+# Map marker diameters (max 8px), scaled by area like Plotly's sizemode="area"
+# but computed once here rather than on every callback
+_REVIEWS_MAX = max(int(df["number_of_reviews"].max()), 1)
+df["_review_size"] = (8 * np.sqrt(df["number_of_reviews"] / _REVIEWS_MAX)).astype("float32")
+
+# Only the columns the violin and map actually read; filtered frames are
+# sliced from this so unused text columns are never copied
+_PLOT_DF = df[
+    [
+        "neighbourhood_group",
+        "neighbourhood",
+        "room_type",
+        "price",
+        "minimum_nights",
+        "number_of_reviews",
+        "latitude",
+        "longitude",
+        "_review_size",
+    ]
+]
 
 # Airbnb-like colors
 AIRBNB_CORAL = "#FF5A5F"
@@ -27,8 +128,22 @@ borough_colors = {
     "Staten Island": AIRBNB_DARK,
 }
 
-neigh_groups = sorted(df["neighbourhood_group"].dropna().unique().tolist())
-room_types = sorted(df["room_type"].dropna().unique().tolist())
+# Shared styling for the compact price charts, registered once as a template
+# instead of being re-applied to every figure on every callback
+pio.templates["airbnb_compact"] = go.layout.Template(pio.templates["simple_white"])
+pio.templates["airbnb_compact"].layout.update(
+    height=220,
+    margin=dict(l=40, r=5, t=10, b=30),
+    legend_title="Neighbourhood Group",
+    dragmode=False,
+    hovermode="closest",
+    showlegend=True,
+    yaxis={"fixedrange": True},
+)
+
+# Categories are already the sorted unique values
+neigh_groups = _NG_CATS.tolist()
+room_types = _RT_CATS.tolist()
 
 neigh_options = [{"label": "All", "value": "All"}] + [
     {"label": g, "value": g} for g in neigh_groups
@@ -47,6 +162,228 @@ price_ceiling_options = [
     {"label": "$1000", "value": 1000},
 ]
 
+
+@njit(parallel=True, cache=True)
+def _scan_kernel(
+    ng_codes, rt_codes, prices, nights, ng_want, rt_want, price_max, hist_cap,
+    n_groups, n_bins, n_chunks,
+):
+    # One pass over the columns producing the filter mask, the KPI sums and
+    # the per-borough histogram. Each chunk accumulates into its own slot and
+    # the slots are merged at the end. ng_want / rt_want of -1 mean "All".
+    n = prices.size
+    chunk = (n + n_chunks - 1) // n_chunks
+    bin_width = hist_cap / n_bins
+
+    mask = np.empty(n, dtype=np.bool_)
+    counts = np.zeros(n_chunks, dtype=np.int64)
+    price_sums = np.zeros(n_chunks)
+    nights_sums = np.zeros(n_chunks)
+    hist = np.zeros((n_chunks, n_groups, n_bins), dtype=np.int64)
+
+    for c in prange(n_chunks):
+        for i in range(c * chunk, min(n, (c + 1) * chunk)):
+            price = prices[i]
+            keep = (
+                ((ng_codes[i] == ng_want) | (ng_want < 0))
+                & ((rt_codes[i] == rt_want) | (rt_want < 0))
+                & (price <= price_max)
+            )
+            mask[i] = keep
+            if keep:
+                counts[c] += 1
+                price_sums[c] += price
+                nights_sums[c] += nights[i]
+                # Listings without a borough (code -1) count towards the KPIs
+                # but have no histogram row to land in
+                if price <= hist_cap and ng_codes[i] >= 0:
+                    b = min(int(price / bin_width), n_bins - 1)
+                    hist[c, ng_codes[i], b] += 1
+
+    return mask, counts.sum(), price_sums.sum(), nights_sums.sum(), hist.sum(axis=0)
+
+
+_SCAN_LOCK = threading.Lock()
+
+
+# Only 6 x 4 x 6 filter states exist, so memoize the scans. The returned
+# arrays are shared between calls and must not be mutated.
+@functools.lru_cache(maxsize=256)
+def _scan(neigh_group, room_type, price_ceiling):
+    ng_want = _NG_TO_IDX[neigh_group]
+    rt_want = _RT_TO_IDX[room_type]
+    price_max = np.inf if price_ceiling == "none" else float(price_ceiling)
+    hist_cap = min(800.0, price_max)
+
+    # Numba's parallel runtime (the workqueue layer in particular) aborts the
+    # process if two threads enter a parallel region at once, and Flask serves
+    # requests from several threads
+    with _SCAN_LOCK:
+        mask, count, price_sum, nights_sum, hist = _scan_kernel(
+            _NG_CODES,
+            _RT_CODES,
+            _PRICE_ARR,
+            _NIGHTS_ARR,
+            ng_want,
+            rt_want,
+            price_max,
+            hist_cap,
+            _NG_CATS.size,
+            HIST_BINS,
+            numba.get_num_threads(),
+        )
+    return mask, count, price_sum, nights_sum, hist_cap, hist
+
+
+def _filtered(neigh_group, room_type, price_ceiling):
+    mask = _scan(neigh_group, room_type, price_ceiling)[0]
+    return _PLOT_DF.iloc[np.flatnonzero(mask)]
+
+
+STAT_COLUMNS = ["min_price", "q1_price", "median_price", "q3_price", "max_price"]
+
+
+@njit(cache=True)
+def _group_quantiles(prices, group_codes, n_groups):
+    # Counting-sort prices into contiguous per-group buckets, then take
+    # min / Q1 / median / Q3 / max of each. Empty groups stay NaN, and rows
+    # with a missing group (code -1) are skipped like groupby drops NaN keys.
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    for g in group_codes:
+        if g >= 0:
+            offsets[g + 1] += 1
+    offsets = np.cumsum(offsets)
+
+    buckets = np.empty(offsets[-1], dtype=np.float64)
+    fill = offsets[:-1].copy()
+    for i in range(prices.size):
+        g = group_codes[i]
+        if g < 0:
+            continue
+        buckets[fill[g]] = prices[i]
+        fill[g] += 1
+
+    out = np.full((n_groups, 5), np.nan)
+    quartiles = np.array([25.0, 50.0, 75.0])
+    for g in range(n_groups):
+        bucket = buckets[offsets[g]:offsets[g + 1]]
+        if bucket.size == 0:
+            continue
+        out[g, 0] = bucket.min()
+        out[g, 1:4] = np.percentile(bucket, quartiles)
+        out[g, 4] = bucket.max()
+    return out
+
+
+def _price_stats(room_type, price_ceiling):
+    mask = _scan("All", room_type, price_ceiling)[0]
+    out = _group_quantiles(_PRICE_ARR[mask], _NG_CODES[mask], _NG_CATS.size)
+    stats = pd.DataFrame(
+        out,
+        index=pd.Index(_NG_CATS, name="neighbourhood_group"),
+        columns=STAT_COLUMNS,
+    )
+    return stats.dropna()
+
+
+def _build_precomputed():
+    # One row per filter state with the KPI sums, plus the borough's price
+    # stats on rows that select a single borough. Per-borough stats only
+    # depend on room type and price ceiling, so they are computed per pair.
+    stats_by_filter = {
+        (room_type, option["value"]): _price_stats(room_type, option["value"])
+        for room_type in ["All"] + room_types
+        for option in price_ceiling_options
+    }
+
+    rows = []
+    for neigh_group in ["All"] + neigh_groups:
+        for room_type in ["All"] + room_types:
+            for option in price_ceiling_options:
+                _, num_listings, price_sum, nights_sum, _, _ = _scan(
+                    neigh_group, room_type, option["value"]
+                )
+                stats = stats_by_filter[(room_type, option["value"])]
+                if neigh_group in stats.index:
+                    group_stats = stats.loc[neigh_group].to_dict()
+                else:
+                    group_stats = dict.fromkeys(STAT_COLUMNS, np.nan)
+                rows.append(
+                    {
+                        "neigh_group": neigh_group,
+                        "room_type": room_type,
+                        "price_ceiling": str(option["value"]),
+                        "num_listings": num_listings,
+                        "price_sum": price_sum,
+                        "nights_sum": nights_sum,
+                        **group_stats,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+# The precomputed tables are a pure function of the CSV and the filter
+# options, so persist them next to it and memory-map them on later starts
+# instead of rescanning. Bump PRECOMPUTED_VERSION when _build_precomputed or
+# the stats definition changes.
+PRECOMPUTED_VERSION = 2
+_PRECOMPUTED_KEY = json.dumps(
+    {
+        "version": PRECOMPUTED_VERSION,
+        "dtypes": DATA_DTYPES,
+        "neigh_groups": neigh_groups,
+        "room_types": room_types,
+        "price_ceilings": [str(option["value"]) for option in price_ceiling_options],
+        "stat_columns": STAT_COLUMNS,
+    },
+    sort_keys=True,
+)
+_FILTER_STATES = {
+    (neigh_group, room_type, str(option["value"]))
+    for neigh_group in ["All"] + neigh_groups
+    for room_type in ["All"] + room_types
+    for option in price_ceiling_options
+}
+
+precomputed = _read_cache(PRECOMPUTED_PATH, _PRECOMPUTED_KEY)
+if precomputed is None or set(
+    zip(precomputed["neigh_group"], precomputed["room_type"], precomputed["price_ceiling"])
+) != _FILTER_STATES:
+    precomputed = _build_precomputed()
+    _write_cache(precomputed, PRECOMPUTED_PATH, _PRECOMPUTED_KEY)
+
+_CEILING_VALUES = {str(option["value"]): option["value"] for option in price_ceiling_options}
+
+# Per-borough price stats keyed by (room_type, price_ceiling)
+_STATS_CACHE = {
+    (room_type, _CEILING_VALUES[ceiling]): (
+        group.set_index("neigh_group")[STAT_COLUMNS].rename_axis("neighbourhood_group")
+    )
+    for (room_type, ceiling), group in precomputed[
+        (precomputed["neigh_group"] != "All") & (precomputed["num_listings"] > 0)
+    ].groupby(["room_type", "price_ceiling"])
+}
+
+
+def _kpis(num_listings, price_sum, nights_sum):
+    if num_listings == 0:
+        return ["N/A", "N/A", "N/A"]
+    return [
+        f"${price_sum / num_listings:,.0f}",
+        f"{num_listings:,}",
+        f"{nights_sum / num_listings:.1f} nights",
+    ]
+
+
+# Formatted KPI strings for every filter state, keyed "neigh|room|ceiling".
+# Shipped to the browser once so the KPI cards update client-side.
+_KPI_TABLE = {
+    f"{row.neigh_group}|{row.room_type}|{row.price_ceiling}": _kpis(
+        row.num_listings, row.price_sum, row.nights_sum
+    )
+    for row in precomputed.itertuples()
+}
+
 # New, bigger hero image
 AIRBNB_LOGO_URL = (
     "https://popsop.com/wp-content/uploads/airbnb_new-logo-2014.png"
@@ -59,6 +396,11 @@ app = Dash(__name__)
 
 server = app.server
 
+cache = Cache(
+    server,
+    config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 0},
+)
+
 app.layout = html.Div(
     style={
         "fontFamily": "system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif",
@@ -171,6 +513,7 @@ app.layout = html.Div(
         ),
 
         # KPI row
+        dcc.Store(id="kpi_table", data=_KPI_TABLE),
         html.Div(
             style={
                 "display": "flex",
@@ -333,30 +676,16 @@ app.layout = html.Div(
 # ===========================
 # Callback
 # ===========================
-@app.callback(
-    Output("price_hist", "figure"),
-    Output("price_violin", "figure"),
-    Output("listing_map", "figure"),
-    Output("kpi_avg_price", "children"),
-    Output("kpi_num_listings", "children"),
-    Output("kpi_avg_min_nights", "children"),
-    Input("global_neigh_group", "value"),
-    Input("global_room_type", "value"),
-    Input("global_price_ceiling", "value"),
-)
-def update_all(neigh_group, room_type, price_ceiling):
-    data = df.copy()
-
-    if neigh_group != "All":
-        data = data[data["neighbourhood_group"] == neigh_group]
-
-    if room_type != "All":
-        data = data[data["room_type"] == room_type]
-
-    if price_ceiling != "none":
-        data = data[data["price"] <= float(price_ceiling)]
+# Figure dicts are memoized per filter state so repeat visits skip the pandas
+# slicing and Plotly figure construction; Dash still JSON-encodes them on
+# every response.
+@cache.memoize()
+def _build_outputs(neigh_group, room_type, price_ceiling):
+    mask, num_listings, _, _, base_cap, hist = _scan(
+        neigh_group, room_type, price_ceiling
+    )
 
-    if data.empty:
+    if num_listings == 0:
         empty_fig = px.scatter(title="No data for selected filters")
         empty_fig.update_layout(
             xaxis={"visible": False},
@@ -364,148 +693,170 @@ def update_all(neigh_group, room_type, price_ceiling):
             template="simple_white",
             height=220,
         )
-        return empty_fig, empty_fig, empty_fig, "N/A", "N/A", "N/A"
-
-    avg_price = data["price"].mean()
-    num_listings = len(data)
-    avg_min_nights = data["minimum_nights"].mean()
-
-    kpi_avg_price = f"${avg_price:,.0f}"
-    kpi_num_listings = f"{num_listings:,}"
-    kpi_avg_min_nights = f"{avg_min_nights:.1f} nights"
-
-    # Histogram
-    base_cap = 800
-    if price_ceiling != "none":
-        base_cap = min(base_cap, float(price_ceiling))
-    hist_data = data[data["price"] <= base_cap]
-
-    hist_fig = px.histogram(
-        hist_data,
-        x="price",
-        color="neighbourhood_group",
-        nbins=50,
-        opacity=0.8,
-        barmode="overlay",
-        color_discrete_map=borough_colors,
-    )
+        empty_json = empty_fig.to_plotly_json()
+        return empty_json, empty_json, empty_json
+
+    # Histogram (binned in the scan so only the bar heights are sent to the browser)
+    edges = np.linspace(0, base_cap, HIST_BINS + 1)
+    bin_ranges = np.column_stack([edges[:-1], edges[1:]])
+
+    hist_fig = go.Figure()
+    for group, group_counts in zip(_NG_CATS, hist):
+        if not group_counts.any():
+            continue
+        hist_fig.add_trace(
+            go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=group_counts,
+                width=edges[1] - edges[0],
+                name=group,
+                marker_color=borough_colors[group],
+                opacity=0.8,
+                customdata=bin_ranges,
+                hovertemplate=(
+                    "Price: %{customdata[0]:$,.0f}-%{customdata[1]:$,.0f}<br>"
+                    "Listings: %{y}<extra></extra>"
+                ),
+            )
+        )
     hist_fig.update_layout(
-        xaxis_title="Nightly Price (USD)",
+        template="airbnb_compact",
+        barmode="overlay",
+        xaxis={"title": "Nightly Price (USD)", "range": [0, base_cap], "fixedrange": True},
         yaxis_title="Number of Listings",
-        template="simple_white",
-        height=220,
-        margin=dict(l=40, r=5, t=10, b=30),
-        legend_title="Neighbourhood Group",
-        dragmode=False,
-        hovermode="closest",
-        showlegend=True,
     )
-    hist_fig.update_xaxes(range=[0, base_cap], fixedrange=True)
-    hist_fig.update_yaxes(fixedrange=True)
 
     # Violin + stats hover
-    stats = (
-        data.groupby("neighbourhood_group")["price"]
-        .agg(
-            min_price="min",
-            q1_price=lambda s: s.quantile(0.25),
-            median_price="median",
-            q3_price=lambda s: s.quantile(0.75),
-            max_price="max",
+    data = _filtered(neigh_group, room_type, price_ceiling)
+    # Group stats are the same for every row of a borough, so they are baked
+    # into each trace's hovertemplate instead of being repeated per row
+    stats = _STATS_CACHE[(room_type, price_ceiling)]
+
+    violin_fig = go.Figure()
+    for group, sub in data.groupby("neighbourhood_group", observed=True):
+        group_stats = stats.loc[group]
+        violin_fig.add_trace(
+            go.Violin(
+                x0=group,
+                y=sub["price"],
+                name=group,
+                legendgroup=group,
+                scalegroup="price",
+                line_color=borough_colors[group],
+                box_visible=True,
+                points=False,
+                customdata=sub[
+                    ["room_type", "minimum_nights", "number_of_reviews"]
+                ].to_numpy(),
+                hovertemplate=(
+                    "Neighbourhood: %{x}<br>"
+                    "Price: %{y:$,.0f}<br>"
+                    "Room type: %{customdata[0]}<br>"
+                    "Min nights: %{customdata[1]}<br>"
+                    "Reviews: %{customdata[2]}<br>"
+                    "<br>"
+                    "Group stats:<br>"
+                    f"Min: ${group_stats['min_price']:,.0f}<br>"
+                    f"Q1: ${group_stats['q1_price']:,.0f}<br>"
+                    f"Median: ${group_stats['median_price']:,.0f}<br>"
+                    f"Q3: ${group_stats['q3_price']:,.0f}<br>"
+                    f"Max: ${group_stats['max_price']:,.0f}<extra></extra>"
+                ),
+            )
         )
-        .reset_index()
-    )
-    data_violin = data.merge(stats, on="neighbourhood_group", how="left")
-
-    violin_fig = px.violin(
-        data_violin,
-        x="neighbourhood_group",
-        y="price",
-        color="neighbourhood_group",
-        box=True,
-        points=False,
-        color_discrete_map=borough_colors,
-        category_orders={"neighbourhood_group": neigh_groups},
-        custom_data=[
-            "room_type",
-            "minimum_nights",
-            "number_of_reviews",
-            "min_price",
-            "q1_price",
-            "median_price",
-            "q3_price",
-            "max_price",
-        ],
-    )
     violin_fig.update_layout(
-        xaxis_title="Neighbourhood Group",
-        yaxis_title="Nightly Price (USD)",
-        template="simple_white",
-        height=220,
-        margin=dict(l=40, r=5, t=10, b=40),
-        legend_title="Neighbourhood Group",
-        dragmode=False,
-        hovermode="closest",
-        showlegend=True,
-    )
-    violin_fig.update_yaxes(range=[0, PRICE_AXIS_MAX], fixedrange=True)
-    violin_fig.update_xaxes(tickangle=0)
-    violin_fig.update_traces(
-        hovertemplate=(
-            "Neighbourhood: %{x}<br>"
-            "Price: %{y:$,.0f}<br>"
-            "Room type: %{customdata[0]}<br>"
-            "Min nights: %{customdata[1]}<br>"
-            "Reviews: %{customdata[2]}<br>"
-            "<br>"
-            "Group stats:<br>"
-            "Min: %{customdata[3]:$,.0f}<br>"
-            "Q1: %{customdata[4]:$,.0f}<br>"
-            "Median: %{customdata[5]:$,.0f}<br>"
-            "Q3: %{customdata[6]:$,.0f}<br>"
-            "Max: %{customdata[7]:$,.0f}<extra></extra>"
-        )
-    )
-
-    # Map
-    map_data = data.dropna(subset=["latitude", "longitude"]).copy()
-    map_fig = px.scatter_mapbox(
-        map_data,
-        lat="latitude",
-        lon="longitude",
-        color="neighbourhood_group",
-        color_discrete_map=borough_colors,
-        size="number_of_reviews",
-        size_max=8,
-        zoom=9.8,
-        center={"lat": 40.7128, "lon": -74.0060},
-        mapbox_style="carto-positron",
-        hover_name="neighbourhood",
-        hover_data={
-            "price": True,
-            "room_type": True,
-            "number_of_reviews": True,
-            "minimum_nights": True,
+        template="airbnb_compact",
+        violinmode="overlay",
+        margin_b=40,
+        xaxis={
+            "title": "Neighbourhood Group",
+            "tickangle": 0,
+            "categoryorder": "array",
+            "categoryarray": neigh_groups,
         },
+        yaxis={"title": "Nightly Price (USD)", "range": [0, PRICE_AXIS_MAX]},
     )
-    map_fig.update_traces(marker={"opacity": 0.6})
+
+    # Map (subsampled so the browser stays responsive on broad filters)
+    map_data = data
+    if len(map_data) > MAP_MAX_POINTS:
+        map_data = map_data.sample(MAP_MAX_POINTS, random_state=0)
+
+    map_fig = go.Figure()
+    for group, sub in map_data.groupby("neighbourhood_group", observed=True):
+        map_fig.add_trace(
+            go.Scattermapbox(
+                lat=sub["latitude"],
+                lon=sub["longitude"],
+                mode="markers",
+                name=group,
+                marker={
+                    "color": borough_colors[group],
+                    "opacity": 0.6,
+                    "size": sub["_review_size"],
+                },
+                hovertext=sub["neighbourhood"],
+                customdata=sub[
+                    ["price", "room_type", "number_of_reviews", "minimum_nights"]
+                ].to_numpy(),
+                hovertemplate=(
+                    "<b>%{hovertext}</b><br><br>"
+                    "price=%{customdata[0]}<br>"
+                    "room_type=%{customdata[1]}<br>"
+                    "number_of_reviews=%{customdata[2]}<br>"
+                    "minimum_nights=%{customdata[3]}<extra></extra>"
+                ),
+            )
+        )
     map_fig.update_layout(
         height=260,
         margin={"l": 0, "r": 0, "t": 10, "b": 0},
         paper_bgcolor="#FFFFFF",
         font={"family": "system-ui, -apple-system, 'Segoe UI', sans-serif", "size": 11},
-        legend_title="Neighbourhood Group",
+        legend={"title": "Neighbourhood Group", "itemsizing": "constant"},
+        mapbox={
+            "style": "carto-positron",
+            "zoom": 9.8,
+            "center": {"lat": 40.7128, "lon": -74.0060},
+        },
     )
 
     return (
-        hist_fig,
-        violin_fig,
-        map_fig,
-        kpi_avg_price,
-        kpi_num_listings,
-        kpi_avg_min_nights,
+        hist_fig.to_plotly_json(),
+        violin_fig.to_plotly_json(),
+        map_fig.to_plotly_json(),
     )
 
 
+@app.callback(
+    Output("price_hist", "figure"),
+    Output("price_violin", "figure"),
+    Output("listing_map", "figure"),
+    Input("global_neigh_group", "value"),
+    Input("global_room_type", "value"),
+    Input("global_price_ceiling", "value"),
+)
+def update_all(neigh_group, room_type, price_ceiling):
+    return _build_outputs(neigh_group, room_type, price_ceiling)
+
+
+# KPIs are a plain lookup into the precomputed table, so they never need a
+# server roundtrip
+app.clientside_callback(
+    """
+    function(neighGroup, roomType, priceCeiling, table) {
+        return table[neighGroup + "|" + roomType + "|" + priceCeiling];
+    }
+    """,
+    Output("kpi_avg_price", "children"),
+    Output("kpi_num_listings", "children"),
+    Output("kpi_avg_min_nights", "children"),
+    Input("global_neigh_group", "value"),
+    Input("global_room_type", "value"),
+    Input("global_price_ceiling", "value"),
+    State("kpi_table", "data"),
+)
+
+
 if __name__ == "__main__":
     app.run(debug=True)